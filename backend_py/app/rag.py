@@ -1,30 +1,245 @@
 import os
 import json
+import functools
+import hashlib
+import heapq
+import itertools
+import math
+import multiprocessing
 import re
-from datetime import datetime
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
-from sentence_transformers import SentenceTransformer
+import faiss
+import httpx
 import numpy as np
-from pathlib import Path
-import PyPDF2
-from numpy.linalg import norm
-import chromadb
-from chromadb.config import Settings
 # LangChain imports
-from langchain.document_loaders import PyPDFLoader
+from langchain_community.document_loaders import PyMuPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
-from langchain_community.vectorstores import Chroma
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
 from langchain_core.documents import Document
-from langchain.schema import BaseRetriever
+from langchain_core.embeddings import Embeddings
 
 # Maintain your existing directory structure
 DOCUMENTS_DIR = os.path.join(os.path.dirname(__file__), "documents")
 
-@dataclass
+# FastEmbed runs the embedding model through ONNX Runtime; any FastEmbed model
+# name (including the smaller/quantized ONNX exports) can be swapped in here.
+EMBED_MODEL_NAME = os.getenv("RAG_EMBED_MODEL", "BAAI/bge-base-en-v1.5")
+# Chunks per ONNX forward pass; chunks are length-sorted so batches pad little
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "64"))
+# ONNX Runtime intra-op threads; an operator-set OMP_NUM_THREADS is respected
+EMBED_THREADS = int(os.getenv("RAG_EMBED_THREADS", os.getenv("OMP_NUM_THREADS", str(os.cpu_count() or 1))))
+# Data-parallel embedding worker processes for large ingests (0 = one per core);
+# unset keeps encoding in-process
+EMBED_PARALLEL = int(os.environ["RAG_EMBED_PARALLEL"]) if os.getenv("RAG_EMBED_PARALLEL") else None
+
+# Above this many chunks the flat index is swapped for a compressed IVFPQ index
+IVFPQ_MIN_CHUNKS = int(os.getenv("RAG_IVFPQ_MIN_CHUNKS", "50000"))
+IVFPQ_NPROBE = int(os.getenv("RAG_IVFPQ_NPROBE", "16"))
+# Set RAG_LARGE_INDEX=hnsw to use an HNSW graph instead of IVFPQ for large
+# corpora: uncompressed vectors, but no training and cheap incremental adds
+LARGE_INDEX_TYPE = os.getenv("RAG_LARGE_INDEX", "ivfpq").lower()
+HNSW_M = int(os.getenv("RAG_HNSW_M", "32"))
+HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "64"))
+
+# Optional scalar quantization for the flat index: "fp16" halves and "8bit"
+# quarters the bytes scanned per query, at a small recall cost.
+FAISS_QUANTIZATION = os.getenv("RAG_FAISS_QUANTIZATION", "").lower()
+_SQ_TYPES = {"fp16": "QT_fp16", "8bit": "QT_8bit"}
+
+# Number of distinct query strings whose embeddings are kept in memory
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "1024"))
+
+# Retrieval results cache for the enhanced chain (see QueryCache)
+RESULT_CACHE_SIZE = int(os.getenv("RAG_RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("RAG_RESULT_CACHE_TTL", "600"))
+RESULT_CACHE_SIMILARITY = float(os.getenv("RAG_RESULT_CACHE_SIMILARITY", "0.9"))
+
+# Hybrid rerank: weights of min-max normalized BM25 and dense scores, and how
+# many candidates each side contributes before fusion
+HYBRID_KEYWORD_WEIGHT = float(os.getenv("RAG_HYBRID_KEYWORD_WEIGHT", "0.3"))
+HYBRID_SEMANTIC_WEIGHT = float(os.getenv("RAG_HYBRID_SEMANTIC_WEIGHT", "0.7"))
+HYBRID_CANDIDATES = int(os.getenv("RAG_HYBRID_CANDIDATES", "20"))
+# Long queries (chat adds the validation status text) keep only their rarest terms
+HYBRID_MAX_QUERY_TERMS = int(os.getenv("RAG_HYBRID_MAX_QUERY_TERMS", "16"))
+
+# Chunks shorter than this (after stripping whitespace) are not indexed
+MIN_CHUNK_CHARS = int(os.getenv("RAG_MIN_CHUNK_CHARS", "100"))
+
+# Parsed PDF pages are cached here keyed by the file's content hash
+RAG_CACHE_DIR = os.getenv("RAG_CACHE_DIR", "/tmp/rag_cache")
+
+def _chunk_sizing():
+    """(length_function, chunk_size, chunk_overlap, max_section_length) for chunking.
+
+    Measured in tokens of the embedding model's tokenizer, keeping whole sections
+    under its 512-token window; falls back to the original character sizes.
+    """
+    try:
+        from tokenizers import Tokenizer
+        tokenizer = Tokenizer.from_pretrained(EMBED_MODEL_NAME)
+        count_tokens = lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+        return count_tokens, 300, 50, 480
+    except Exception as e:
+        print(f"Tokenizer for {EMBED_MODEL_NAME} unavailable, chunking by characters: {e}")
+        return len, 1200, 200, 2000
+
+try:
+    import xxhash
+    def _content_digest(text: str) -> int:
+        return xxhash.xxh3_64_intdigest(text)
+except ImportError:
+    def _content_digest(text: str) -> int:
+        return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+try:
+    from rank_bm25 import BM25Okapi
+except ImportError:
+    BM25Okapi = None  # reranker falls back to query-word overlap
+
+def _parse_pdf(path: str) -> List[Dict[str, Any]]:
+    """Extract a PDF's pages as plain dicts (picklable across worker processes)."""
+    return [{"page_content": d.page_content, "metadata": d.metadata} for d in PyMuPDFLoader(path).load()]
+
+def _file_sha1(path: str) -> str:
+    """Content hash of a file, read in 1 MiB blocks."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length so inner product == cosine similarity."""
+    return vectors / (np.linalg.norm(vectors, axis=-1, keepdims=True) + 1e-12)
+
+class _UnitEmbeddings(Embeddings):
+    """Embeds each distinct text once per call and returns unit-length vectors.
+
+    The FAISS indexes score by inner product, so normalizing here (rather than
+    trusting the model to) keeps scores cosine for any RAG_EMBED_MODEL.
+    """
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        unique_texts = list(dict.fromkeys(texts))
+        vectors = _l2_normalize(np.asarray(self.embeddings.embed_documents(unique_texts), dtype=np.float32))
+        by_text = dict(zip(unique_texts, vectors.tolist()))
+        return [by_text[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return _l2_normalize(np.asarray(self.embeddings.embed_query(text), dtype=np.float32)).tolist()
+
+class QueryCache:
+    """LRU + TTL cache of retrieved documents per query.
+
+    Lookups try the normalized query text first, then fall back to the most
+    similar cached query embedding (unit vectors, so dot product == cosine).
+    """
+
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL,
+                 similarity_threshold: float = RESULT_CACHE_SIMILARITY):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return hashlib.sha1(query.strip().lower().encode()).hexdigest()
+
+    def _expire(self, now: float):
+        for key in [k for k, e in self._entries.items() if e["expires_at"] <= now]:
+            del self._entries[key]
+            self.evictions += 1
+
+    def get(self, query: str) -> Optional[List[Document]]:
+        """Exact lookup by normalized query text."""
+        with self._lock:
+            self._expire(time.monotonic())
+            key = self._key(query)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["docs"]
+
+    def get_similar(self, embedding) -> Optional[List[Document]]:
+        """Lookup by the closest cached query embedding above the threshold."""
+        with self._lock:
+            self._expire(time.monotonic())
+            if self._entries:
+                keys = list(self._entries)
+                matrix = np.stack([self._entries[k]["embedding"] for k in keys])
+                similarities = matrix @ np.asarray(embedding, dtype=np.float32)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.semantic_hits += 1
+                    return self._entries[keys[best]]["docs"]
+            self.misses += 1
+            return None
+
+    def put(self, query: str, embedding, docs: List[Document]):
+        with self._lock:
+            key = self._key(query)
+            self._entries[key] = {
+                "embedding": np.asarray(embedding, dtype=np.float32),
+                "docs": docs,
+                "expires_at": time.monotonic() + self.ttl,
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+@dataclass(slots=True)
 class InsuranceChunk:
     """Structured representation of insurance document chunks"""
     content: str
@@ -35,14 +250,75 @@ class InsuranceChunk:
     conditions: List[str]  # If-then conditions found
     numerical_values: Dict[str, float]  # Extracted amounts, percentages
 
+def _chunk_to_document(chunk: InsuranceChunk) -> Document:
+    """LangChain Document for a chunk, as stored in the vectorstore"""
+    # Keep metadata to flat primitives so it serializes with the vectorstore
+    clean_metadata = {}
+    
+    if chunk.metadata:
+        for key, value in chunk.metadata.items():
+            if isinstance(value, (str, int, float, bool, type(None))):
+                clean_metadata[key] = value
+    
+    # Convert complex fields to strings
+    clean_metadata['section_type'] = str(chunk.section_type) if chunk.section_type else ''
+    clean_metadata['cross_references'] = ', '.join(str(ref) for ref in chunk.cross_references) if chunk.cross_references else ''
+    clean_metadata['conditions'] = ' | '.join(str(cond) for cond in chunk.conditions) if chunk.conditions else ''
+    clean_metadata['hierarchy'] = ' > '.join(str(hier) for hier in chunk.section_hierarchy) if chunk.section_hierarchy else ''
+    
+    return Document(page_content=chunk.content, metadata=clean_metadata)
+
+@dataclass(slots=True)
+class PolicySection:
+    """Fixed-slot view of a chunk for prompt building (no metadata dict lookups)"""
+    section_type: str
+    hierarchy: str
+    page: Optional[int]
+    content: str
+
+    @classmethod
+    def from_document(cls, doc: Document) -> "PolicySection":
+        metadata = doc.metadata
+        return cls(metadata.get('section_type', ''), metadata.get('hierarchy', ''),
+                   metadata.get('page'), doc.page_content)
+
+    def render(self) -> str:
+        parts = []
+        if self.section_type:
+            parts.append(f"[{self.section_type.upper()}] ")
+        if self.hierarchy:
+            parts.append(f"Section {self.hierarchy}: ")
+        parts += ("\n", self.content, "\n")
+        return "".join(parts)
+
 class RAGService:
     """Enhanced RAG Service - consolidates original and enhanced retrieval"""
     
     def __init__(self):
         self.document_processor = InsuranceDocumentProcessor()
-        self.vectorstore = None  # ChromaDB vectorstore
+        # Load the ONNX embedding model once and reuse it for every (re)build and query
+        self.embed_model = FastEmbedEmbeddings(
+            model_name=EMBED_MODEL_NAME,
+            threads=EMBED_THREADS,
+            batch_size=EMBED_BATCH_SIZE,
+            parallel=EMBED_PARALLEL,
+        )
+        # Chunk embeddings are cached on disk by text, so boilerplate shared
+        # across policy PDFs, re-ingested files and restarts are encoded once
+        self.doc_embeddings = CacheBackedEmbeddings.from_bytes_store(
+            _UnitEmbeddings(self.embed_model),
+            LocalFileStore(os.path.join(RAG_CACHE_DIR, "embeddings")),
+            namespace=EMBED_MODEL_NAME,
+        )
+        # Chat turns and claim analyses repeat the same queries; skip re-encoding them
+        self.embed_query = functools.lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)(
+            lambda text: tuple(self.doc_embeddings.embed_query(text))
+        )
+        self.vectorstore = None  # FAISS vectorstore
+        self.query_cache = QueryCache()
         self.hybrid_retriever = None
-        
+        self.ingested_hashes = set()  # file hashes already in the vectorstore
+
         # Initialize the enhanced retrieval system at startup
         print("Attempting to initialize enhanced retrieval system during RAGService init...")
         self.initialize_enhanced_retrieval()
@@ -59,27 +335,95 @@ class RAGService:
             print(f"No PDF documents found in {DOCUMENTS_DIR} or provided paths.")
             return []
 
+        # Namespaced by extractor so text cached from a different parser is not reused
+        pages_cache_dir = os.path.join(RAG_CACHE_DIR, "pages-pymupdf")
+        os.makedirs(pages_cache_dir, exist_ok=True)
+
+        # Resolve cache hits first; only the misses need parsing
+        pages_by_path: Dict[str, List[Dict[str, Any]]] = {}
+        to_parse = []
         for path in files_to_load:
             try:
-                loader = PyPDFLoader(path)
-                documents = loader.load()
-                all_documents.extend(documents)
-                print(f"Loaded {len(documents)} pages from {path}")
+                file_hash = _file_sha1(path)
+                cache_path = os.path.join(pages_cache_dir, f"{file_hash}.json")
+                if os.path.exists(cache_path):
+                    with open(cache_path, "r", encoding="utf-8") as f:
+                        pages_by_path[path] = json.load(f)
+                    print(f"Loaded {len(pages_by_path[path])} cached pages for {path}")
+                else:
+                    to_parse.append((path, file_hash, cache_path))
+            except Exception as e:
+                print(f"Error loading document {path}: {e}")
+
+        # PDF text extraction is CPU-bound, so parse files in separate processes.
+        # Spawned, not forked: this runs in a threaded server with ONNX Runtime
+        # pools alive, and a forked child can inherit a held lock and deadlock.
+        if len(to_parse) > 1:
+            with ProcessPoolExecutor(
+                max_workers=min(len(to_parse), os.cpu_count() or 1),
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as executor:
+                futures = {executor.submit(_parse_pdf, path): (path, file_hash, cache_path) for path, file_hash, cache_path in to_parse}
+                parsed = [(futures[future], future) for future in futures]
+        else:
+            parsed = [((path, file_hash, cache_path), None) for path, file_hash, cache_path in to_parse]
+
+        for (path, file_hash, cache_path), future in parsed:
+            try:
+                pages = future.result() if future is not None else _parse_pdf(path)
+                for page in pages:
+                    page["metadata"]["file_hash"] = file_hash
+                tmp_path = f"{cache_path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(pages, f)
+                os.replace(tmp_path, cache_path)
+                pages_by_path[path] = pages
+                print(f"Loaded {len(pages)} pages from {path}")
             except Exception as e:
                 print(f"Error loading document {path}: {e}")
+
+        # Keep the caller's file order regardless of which files hit the cache
+        for path in files_to_load:
+            for page in pages_by_path.get(path, ()):
+                all_documents.append(Document(page_content=page["page_content"], metadata=page["metadata"]))
         return all_documents
 
     def add_documents(self, file_paths: List[str]):
-        """Adds new documents to the RAG system by re-initializing the retriever."""
+        """Adds new documents to the existing FAISS index without rebuilding it."""
         if not file_paths:
             return
-        
-        print(f"Adding {len(file_paths)} new documents. Re-initializing RAG service.")
-        # For simplicity, re-initialize the entire enhanced retrieval with new documents
-        # In a production system, you'd update the vectorstore incrementally.
-        self.initialize_enhanced_retrieval(new_file_paths=file_paths)
 
-    def initialize_enhanced_retrieval(self, persist_directory: str = "/tmp/chroma_rag_db", new_file_paths: Optional[List[str]] = None):
+        if self.vectorstore is None or self.hybrid_retriever is None:
+            print(f"Adding {len(file_paths)} new documents. Initializing RAG service.")
+            self.initialize_enhanced_retrieval(new_file_paths=file_paths)
+            return
+
+        try:
+            # Skip files whose content is already in the index
+            new_documents = [
+                d for d in self._load_documents(file_paths=file_paths)
+                if d.metadata.get("file_hash") not in self.ingested_hashes
+            ]
+            if not new_documents:
+                return
+
+            insurance_chunks = self.document_processor.intelligent_chunking(new_documents)
+            langchain_docs = self._convert_to_langchain_docs(insurance_chunks)
+            langchain_docs.sort(key=lambda d: len(d.page_content))
+
+            # Only the new chunks are embedded; FAISS appends them to its own
+            # storage, so nothing already indexed is copied or re-embedded.
+            self.vectorstore.add_documents(langchain_docs)
+            self.hybrid_retriever.add_chunks(insurance_chunks)
+            self.ingested_hashes.update(d.metadata.get("file_hash") for d in new_documents)
+            self.query_cache.clear()  # cached results predate the new chunks
+            print(f"Added {len(insurance_chunks)} chunks from {len(new_documents)} new pages")
+        except Exception as e:
+            print(f"Failed to add documents to enhanced retrieval: {e}")
+            import traceback
+            traceback.print_exc()
+
+    def initialize_enhanced_retrieval(self, persist_directory: str = "/tmp/faiss_rag_db", new_file_paths: Optional[List[str]] = None):
         """Initialize enhanced retrieval capabilities by loading all documents from DOCUMENTS_DIR or provided paths."""
         try:
             # Load all documents from the predefined directory or provided new paths
@@ -98,31 +442,40 @@ class RAGService:
             
             # Convert to LangChain documents
             langchain_docs = self._convert_to_langchain_docs(insurance_chunks)
+            # Smart batching: the embedder pads each batch to its longest chunk, so
+            # grouping chunks of similar length avoids wasted forward-pass work.
+            # Vectorstore insertion order has no effect on retrieval.
+            langchain_docs.sort(key=lambda d: len(d.page_content))
             
-            # Create or load vectorstore
-            embed_model = FastEmbedEmbeddings(model_name="BAAI/bge-base-en-v1.5")
+            # Create or load vectorstore. The index directory is keyed by the hashes
+            # of the source files plus the embedding, chunking and index settings,
+            # so a changed corpus or configuration never reuses a stale index.
+            embed_model = self.doc_embeddings
+            corpus_hash = hashlib.sha1(
+                ("".join(sorted({d.metadata.get("file_hash", "") for d in all_documents}))
+                 + self._index_settings_key()).encode()
+            ).hexdigest()
+            index_directory = os.path.join(persist_directory, corpus_hash)
             
-            if os.path.exists(persist_directory) and os.listdir(persist_directory):
-                print(f"Loading existing vectorstore from {persist_directory}")
-                self.vectorstore = Chroma(
-                    persist_directory=persist_directory,
-                    embedding_function=embed_model
+            if os.path.exists(os.path.join(index_directory, "index.faiss")):
+                print(f"Loading existing vectorstore from {index_directory}")
+                self.vectorstore = FAISS.load_local(
+                    index_directory,
+                    embed_model,
+                    distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+                    allow_dangerous_deserialization=True,  # our own index, written below
                 )
             else:
-                print(f"Creating new vectorstore at {persist_directory}")
-                self.vectorstore = Chroma.from_documents(
-                langchain_docs,
-                embedding=embed_model,
-                persist_directory=persist_directory,
-                client_settings=Settings(
-                    chroma_db_impl="duckdb+parquet",
-                    persist_directory=persist_directory,
-                    anonymized_telemetry=False
-                )
-                    )
+                print(f"Creating new vectorstore at {index_directory}")
+                self.vectorstore = self._build_vectorstore(langchain_docs)
+                self.vectorstore.save_local(index_directory)
+            
+            self._move_index_to_gpu()
             
             # Initialize hybrid retriever
             self.hybrid_retriever = HybridInsuranceRetriever(self.vectorstore, insurance_chunks)
+            self.ingested_hashes = {d.metadata.get("file_hash") for d in all_documents}
+            self.query_cache.clear()
             print("Enhanced retrieval system initialized successfully")
             
         except Exception as e:
@@ -131,33 +484,99 @@ class RAGService:
             traceback.print_exc() # Print full traceback for debugging
             self.hybrid_retriever = None # Ensure retriever is None on failure
 
-    def retrieve(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def _index_settings_key(self) -> str:
+        """Settings that change the stored vectors or the index built over them"""
+        return "|".join(map(str, (
+            EMBED_MODEL_NAME, self.document_processor.settings_key,
+            FAISS_QUANTIZATION, LARGE_INDEX_TYPE, IVFPQ_MIN_CHUNKS,
+            IVFPQ_NPROBE, HNSW_M, HNSW_EF_SEARCH,
+        )))
+
+    def _build_vectorstore(self, langchain_docs: List[Document]) -> FAISS:
+        """Build a FAISS vectorstore, switching to IVFPQ (or HNSW) once the corpus is large."""
+        if len(langchain_docs) < IVFPQ_MIN_CHUNKS and FAISS_QUANTIZATION not in _SQ_TYPES:
+            # Vectors are normalized at embed time, so inner product == cosine
+            # and FAISS can use a flat IndexFlatIP with BLAS-blocked kernels.
+            return FAISS.from_documents(
+                langchain_docs,
+                self.doc_embeddings,
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+            )
+
+        texts = [d.page_content for d in langchain_docs]
+        embeddings = np.asarray(self.doc_embeddings.embed_documents(texts), dtype=np.float32)
+        n, dim = embeddings.shape
+
+        if n < IVFPQ_MIN_CHUNKS:
+            qtype = getattr(faiss.ScalarQuantizer, _SQ_TYPES[FAISS_QUANTIZATION])
+            print(f"Building {FAISS_QUANTIZATION} scalar-quantized index for {n} chunks")
+            index = faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_INNER_PRODUCT)
+            index.train(embeddings)  # per-dimension ranges for 8bit; no-op for fp16
+            index.add(embeddings)
+            return self._wrap_index(index, langchain_docs)
+
+        if LARGE_INDEX_TYPE == "hnsw":
+            print(f"Building HNSW index for {n} chunks (M={HNSW_M})")
+            index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            index.add(embeddings)
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+            return self._wrap_index(index, langchain_docs)
+
+        nlist = int(4 * math.sqrt(n))
+        # 48 sub-quantizers (~48 bytes/vector) when the dimension allows it
+        m = next(m for m in (48, 32, 24, 16, 8, 4, 2, 1) if dim % m == 0)
+        print(f"Building IVFPQ index for {n} chunks (nlist={nlist}, m={m})")
+
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, m, 8, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+        index.add(embeddings)
+        index.nprobe = IVFPQ_NPROBE
+        return self._wrap_index(index, langchain_docs)
+
+    def _wrap_index(self, index, langchain_docs: List[Document]) -> FAISS:
+        """Wrap a prebuilt FAISS index whose rows follow langchain_docs' order."""
+        ids = [str(uuid.uuid4()) for _ in langchain_docs]
+        return FAISS(
+            self.doc_embeddings,
+            index,
+            InMemoryDocstore(dict(zip(ids, langchain_docs))),
+            dict(enumerate(ids)),
+            distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT,
+        )
+
+    def _move_index_to_gpu(self):
+        """Mirror the (already persisted) FAISS index onto any visible GPUs for search."""
+        if faiss.get_num_gpus() == 0:
+            return
+        try:
+            self.vectorstore.index = faiss.index_cpu_to_all_gpus(self.vectorstore.index)
+            print(f"FAISS index mirrored to {faiss.get_num_gpus()} GPU(s)")
+        except Exception as e:
+            print(f"Keeping FAISS index on CPU: {e}")
+
+    def retrieve(self, query: str, top_k: int = 5, embedding: Optional[List[float]] = None) -> List[Dict[str, Any]]:
         """Main retrieval method. Uses hybrid_retriever if initialized, otherwise returns empty list."""
         if self.hybrid_retriever:
             try:
-                docs = self.hybrid_retriever.get_relevant_documents(query)
+                if embedding is None:
+                    embedding = list(self.embed_query(query))
+                # The retriever already returns at most top_k distinct chunks
+                docs = self.hybrid_retriever.get_relevant_documents(query, embedding=embedding, k=top_k)
                 results = []
-                seen_content = set()
                 
-                for i, doc in enumerate(docs[:top_k * 2]):  # Get more to account for duplicates
-                    # Create a simple hash of the content to detect duplicates
-                    content_hash = hash(doc.page_content[:100])
-                    if content_hash not in seen_content:
-                        seen_content.add(content_hash)
-                        results.append({
-                            "id": f"enhanced-{len(results)}",
-                            "text": doc.page_content,
-                            "doc_id": doc.metadata.get('source', 'unknown'),
-                            "chunk_id": str(doc.metadata.get('chunk_id', len(results))),
-                            "score": 1.0 - (len(results) * 0.1),
-                            "section_type": doc.metadata.get('section_type', ''),
-                            "hierarchy": doc.metadata.get('hierarchy', ''),
-                            "cross_references": doc.metadata.get('cross_references', ''),
-                            "conditions": doc.metadata.get('conditions', '')
-                        })
-                        
-                        if len(results) >= top_k:
-                            break
+                for i, doc in enumerate(docs):
+                    results.append({
+                        "id": f"enhanced-{i}",
+                        "text": doc.page_content,
+                        "doc_id": doc.metadata.get('source', 'unknown'),
+                        "chunk_id": str(doc.metadata.get('chunk_id', i)),
+                        "score": 1.0 - (i * 0.1),
+                        "section_type": doc.metadata.get('section_type', ''),
+                        "hierarchy": doc.metadata.get('hierarchy', ''),
+                        "cross_references": doc.metadata.get('cross_references', ''),
+                        "conditions": doc.metadata.get('conditions', '')
+                    })
                 return results
             except Exception as E:
                 print(f"Retrieval Error in hybrid_retriever: {E}")
@@ -168,101 +587,15 @@ class RAGService:
             print("RAGService: Hybrid retriever not initialized. Cannot perform retrieval.")
             return [] # Return empty list if no retriever is available
     
-    def initialize_enhanced_retrieval(self, persist_directory: str = "/tmp/chroma_rag_db"):
-        """Initialize enhanced retrieval capabilities by loading all documents from DOCUMENTS_DIR."""
-        try:
-            # Load all documents from the predefined directory
-            all_documents = []
-            files_to_load = [
-                os.path.join(DOCUMENTS_DIR, f) for f in os.listdir(DOCUMENTS_DIR)
-                if f.endswith(".pdf")
-            ]
-            if not files_to_load:
-                print(f"No PDF documents found in {DOCUMENTS_DIR} for enhanced retrieval initialization.")
-                return
-
-            for doc_path in files_to_load:
-                loader = PyPDFLoader(doc_path)
-                documents = loader.load()
-                all_documents.extend(documents)
-                print(f"Loaded {len(documents)} pages from {doc_path}")
-            
-            if not all_documents:
-                print("No documents loaded for enhanced retrieval. Skipping vectorstore creation.")
-                return
-
-            print(f"Total {len(all_documents)} pages loaded for enhanced retrieval.")
-            
-            # Process with intelligent chunking
-            insurance_chunks = self.document_processor.intelligent_chunking(all_documents)
-            print(f"Created {len(insurance_chunks)} intelligent chunks")
-            
-            # Convert to LangChain documents
-            langchain_docs = self._convert_to_langchain_docs(insurance_chunks)
-            
-            # Create or load vectorstore
-            embed_model = FastEmbedEmbeddings(model_name="BAAI/bge-base-en-v1.5")
-            
-            if os.path.exists(persist_directory) and os.listdir(persist_directory):
-                print(f"Loading existing vectorstore from {persist_directory}")
-                self.vectorstore = Chroma(
-                    persist_directory=persist_directory,
-                    embedding_function=embed_model
-                )
-            else:
-                print(f"Creating new vectorstore at {persist_directory}")
-                self.vectorstore = Chroma.from_documents(
-                langchain_docs,
-                embedding=embed_model,
-                persist_directory=persist_directory,
-                client_settings=Settings(
-                    chroma_db_impl="duckdb+parquet",
-                    persist_directory=persist_directory,
-                    anonymized_telemetry=False
-                )
-                    )
-            
-            # Initialize hybrid retriever
-            self.hybrid_retriever = HybridInsuranceRetriever(self.vectorstore, insurance_chunks)
-            print("Enhanced retrieval system initialized successfully")
-            
-        except Exception as e:
-            print(f"Failed to initialize enhanced retrieval: {e}")
-            import traceback
-            traceback.print_exc() # Print full traceback for debugging
-            print("Falling back to original retrieval method")
-    
     def _convert_to_langchain_docs(self, insurance_chunks: List[InsuranceChunk]) -> List[Document]:
         """Convert InsuranceChunk objects to LangChain Documents"""
-        langchain_docs = []
-        for i, chunk in enumerate(insurance_chunks):
-            # Clean metadata for ChromaDB compatibility
-            clean_metadata = {}
-            
-            if hasattr(chunk, 'metadata') and chunk.metadata:
-                for key, value in chunk.metadata.items():
-                    if isinstance(value, (str, int, float, bool, type(None))):
-                        clean_metadata[key] = value
-            
-            # Convert complex fields to strings
-            clean_metadata['section_type'] = str(chunk.section_type) if chunk.section_type else ''
-            clean_metadata['cross_references'] = ', '.join(str(ref) for ref in chunk.cross_references) if chunk.cross_references else ''
-            clean_metadata['conditions'] = ' | '.join(str(cond) for cond in chunk.conditions) if chunk.conditions else ''
-            clean_metadata['hierarchy'] = ' > '.join(str(hier) for hier in chunk.section_hierarchy) if chunk.section_hierarchy else ''
-            
-            doc = Document(
-                page_content=chunk.content,
-                metadata=clean_metadata
-            )
-            langchain_docs.append(doc)
-        
-        return langchain_docs
+        return [_chunk_to_document(chunk) for chunk in insurance_chunks]
     
     def enhanced_retrieve(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
         """Enhanced retrieval using hybrid approach if available"""
         if self.hybrid_retriever:
             try:
-                docs = self.hybrid_retriever.get_relevant_documents(query)
+                docs = self.hybrid_retriever.get_relevant_documents(query, embedding=list(self.embed_query(query)), k=top_k)
                 results = []
                 for i, doc in enumerate(docs[:top_k]):
                     results.append({
@@ -283,7 +616,23 @@ class RAGService:
 
 class InsuranceDocumentProcessor:
     """Advanced processor for insurance documents"""
-    
+
+    # Compiled once; these run over every page and every chunk at ingest
+    _SECTION_RX = re.compile(r'Section\s+([IVX\d]+\.?[\d\w]*)', re.IGNORECASE)
+    _CROSS_REF_RX = re.compile(r'(?:see|refer to|as (?:defined|stated) in)\s+(?:Section\s+)?([IVX\d\.]+)', re.IGNORECASE)
+    _AMOUNT_RX = re.compile(r'\$[\d,]+(?:\.\d{2})?|\d+%|\d+\s*percent')
+    _CONDITION_RX = re.compile(r'(?:if|when|provided that|subject to)[^.!?]*[.!?]', re.IGNORECASE)
+    # Runs over every chunk and matches almost every token; use RE2's linear-time
+    # automaton when google-re2 is installed
+    _HIERARCHY_RX = (re2 or re).compile(r'(?:Section\s+)?([IVX\d]+(?:\.\d+)*(?:\.[a-zA-Z])?)')
+    # Matched against lowercased text, in priority order
+    _CHUNK_TYPE_RXS = [
+        ('definition', re.compile(r'definition|means|shall mean|is defined as')),
+        ('exclusion', re.compile(r'excluded|not covered|limitation|does not apply')),
+        ('coverage', re.compile(r'coverage|covered|benefits|reimburse|pays')),
+        ('procedure', re.compile(r'claim|file|procedure|process|submit')),
+    ]
+
     def __init__(self):
         self.section_patterns = {
             'section': r'Section\s+([IVX\d]+\.?[\d\w]*)',
@@ -293,9 +642,28 @@ class InsuranceDocumentProcessor:
             'coverage': r'covered|coverage|benefits|pays|reimburse',
             'condition': r'if|provided that|subject to|only if|when'
         }
+        # Built once and reused for every page; sized in embedder tokens when
+        # the model's tokenizer is available, so chunks fit its context window
+        self.length_function, chunk_size, chunk_overlap, self.max_section_length = _chunk_sizing()
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            separators=["\n\n", "\n", ". ", "!", "?", ";", " "],
+            length_function=self.length_function
+        )
+        # Identifies the chunk boundaries this processor produces
+        self.settings_key = "|".join(map(str, (
+            "chars" if self.length_function is len else "tokens",
+            chunk_size, chunk_overlap, self.max_section_length, MIN_CHUNK_CHARS,
+        )))
         
-    def extract_structure(self, text: str) -> Dict[str, Any]:
-        """Extract document structure and metadata"""
+    def extract_structure(self, text: str, sections: bool = True, details: bool = True) -> Dict[str, Any]:
+        """Extract document structure and metadata.
+
+        Page-level splitting only needs `sections` and per-chunk metadata only
+        needs the `details` (cross-refs, amounts, conditions), so callers can
+        skip the passes they don't use.
+        """
         structure = {
             'sections': [],
             'definitions': [],
@@ -306,24 +674,25 @@ class InsuranceDocumentProcessor:
         }
         
         # Find section headers
-        for match in re.finditer(self.section_patterns['section'], text, re.IGNORECASE):
-            structure['sections'].append({
-                'number': match.group(1),
-                'start_pos': match.start(),
-                'text': match.group(0)
-            })
-        
+        if sections:
+            for match in self._SECTION_RX.finditer(text):
+                structure['sections'].append({
+                    'number': match.group(1),
+                    'start_pos': match.start(),
+                    'text': match.group(0)
+                })
+
+        if not details:
+            return structure
+
         # Find cross-references
-        cross_ref_pattern = r'(?:see|refer to|as (?:defined|stated) in)\s+(?:Section\s+)?([IVX\d\.]+)'
-        structure['cross_refs'] = re.findall(cross_ref_pattern, text, re.IGNORECASE)
+        structure['cross_refs'] = self._CROSS_REF_RX.findall(text)
         
         # Extract monetary amounts and percentages
-        amount_pattern = r'\$[\d,]+(?:\.\d{2})?|\d+%|\d+\s*percent'
-        structure['amounts'] = re.findall(amount_pattern, text)
+        structure['amounts'] = self._AMOUNT_RX.findall(text)
         
         # Find conditional statements
-        condition_pattern = r'(?:if|when|provided that|subject to)[^.!?]*[.!?]'
-        structure['conditions'] = re.findall(condition_pattern, text, re.IGNORECASE)
+        structure['conditions'] = self._CONDITION_RX.findall(text)
         
         return structure
 
@@ -333,7 +702,7 @@ class InsuranceDocumentProcessor:
         
         for doc in documents:
             text = doc.page_content
-            structure = self.extract_structure(text)
+            structure = self.extract_structure(text, details=False)
             
             # Split by sections first, then by semantic boundaries
             if structure['sections']:
@@ -342,7 +711,11 @@ class InsuranceDocumentProcessor:
                 section_chunks = self._semantic_split_fallback(text)
             
             for i, chunk_text in enumerate(section_chunks):
-                chunk_structure = self.extract_structure(chunk_text)
+                # Whitespace and stray fragments (e.g. a lone "Section 4" header)
+                # only cost an embedding and crowd out real matches
+                if len(chunk_text.strip()) < MIN_CHUNK_CHARS:
+                    continue
+                chunk_structure = self.extract_structure(chunk_text, sections=False)
                 chunk_type = self._classify_chunk_type(chunk_text)
                 
                 chunks.append(InsuranceChunk(
@@ -364,15 +737,7 @@ class InsuranceDocumentProcessor:
     
     def _split_long_section(self, text: str) -> List[str]:
         """Split a long section into smaller chunks while preserving context"""
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1200,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", ". ", "!", "?", ";", " "],
-            length_function=len
-        )
-        temp_doc = Document(page_content=text)
-        sub_chunks = splitter.split_documents([temp_doc])
-        return [chunk.page_content for chunk in sub_chunks]
+        return self.splitter.split_text(text)
     
     def _split_by_sections(self, text: str, structure: Dict) -> List[str]:
         """Split text by logical sections"""
@@ -387,7 +752,7 @@ class InsuranceDocumentProcessor:
             end_pos = sections[i + 1]['start_pos'] if i + 1 < len(sections) else len(text)
             section_text = text[start_pos:end_pos].strip()
             
-            if len(section_text) > 2000:
+            if self.length_function(section_text) > self.max_section_length:
                 sub_chunks = self._split_long_section(section_text)
                 chunks.extend(sub_chunks)
             else:
@@ -397,52 +762,65 @@ class InsuranceDocumentProcessor:
     
     def _semantic_split_fallback(self, text: str) -> List[str]:
         """Improved fallback splitting with overlap"""
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1200,
-            chunk_overlap=200,
-            separators=["\n\n", "\n", ". ", "!", "?", ";", " "],
-            length_function=len
-        )
-        return [chunk.page_content for chunk in splitter.split_documents([Document(page_content=text)])]
+        return self.splitter.split_text(text)
     
     def _classify_chunk_type(self, text: str) -> str:
         """Classify chunk by content type"""
         text_lower = text.lower()
-        
-        if any(word in text_lower for word in ['definition', 'means', 'shall mean', 'is defined as']):
-            return 'definition'
-        elif any(word in text_lower for word in ['excluded', 'not covered', 'limitation', 'does not apply']):
-            return 'exclusion'
-        elif any(word in text_lower for word in ['coverage', 'covered', 'benefits', 'reimburse', 'pays']):
-            return 'coverage'
-        elif any(word in text_lower for word in ['claim', 'file', 'procedure', 'process', 'submit']):
-            return 'procedure'
-        else:
-            return 'general'
+        for chunk_type, pattern in self._CHUNK_TYPE_RXS:
+            if pattern.search(text_lower):
+                return chunk_type
+        return 'general'
     
     def _extract_hierarchy(self, text: str) -> List[str]:
         """Extract section hierarchy from text"""
-        section_matches = re.findall(r'(?:Section\s+)?([IVX\d]+(?:\.\d+)*(?:\.[a-zA-Z])?)', text)
-        return section_matches[:3]
+        # Only the first three labels are kept, so stop scanning after them
+        return [match.group(1) for match in itertools.islice(self._HIERARCHY_RX.finditer(text), 3)]
     
     def _extract_numerical_values(self, amounts: List[str]) -> Dict[str, float]:
         """Extract and parse numerical values"""
         values = {}
         for amount in amounts:
             if '$' in amount:
-                clean_amount = re.sub(r'[^\d.]', '', amount)
+                # _AMOUNT_RX only yields "$1,234.56"-shaped strings
+                clean_amount = amount[1:].replace(',', '')
                 try:
                     values[f'amount_{len(values)}'] = float(clean_amount)
                 except ValueError:
                     pass
             elif '%' in amount or 'percent' in amount:
-                clean_percent = re.sub(r'[^\d.]', '', amount)
+                # and "15%" / "15 percent" shaped ones
+                clean_percent = amount.rstrip('%').removesuffix('percent').strip()
                 try:
                     values[f'percentage_{len(values)}'] = float(clean_percent)
                 except ValueError:
                     pass
         return values
 
+# Word tokens for BM25; the corpus and queries must be split the same way so
+# trailing punctuation ("covered?" vs "covered.") does not block a match
+_TOKEN_RX = re.compile(r"\w+")
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN_RX.findall(text.lower())
+
+# Query types that earn a rerank boost, in feature-column order
+BOOST_QUERY_TYPES = ('coverage_check', 'exclusion_lookup', 'definition_lookup')
+
+def _boost_features(content_lower: str) -> List[float]:
+    """Which query types a chunk's text should be boosted for (see BOOST_QUERY_TYPES)."""
+    return [
+        float('coverage' in content_lower),
+        float('exclusion' in content_lower),
+        float('definition' in content_lower or 'means' in content_lower),
+    ]
+
+def _min_max(scores: np.ndarray) -> np.ndarray:
+    """Scale scores to [0, 1]; all zeros when they do not differ."""
+    low = scores.min()
+    span = scores.max() - low
+    return (scores - low) / span if span > 0 else np.zeros_like(scores)
+
 class HybridInsuranceRetriever:
     """Custom retriever that combines multiple retrieval strategies"""
     
@@ -450,11 +828,82 @@ class HybridInsuranceRetriever:
         self.vectorstore = vectorstore
         self.chunks = chunks
         self.chunk_index = {i: chunk for i, chunk in enumerate(chunks)}
-    
-    def get_relevant_documents(self, query: str) -> List[Document]:
-        """Main retrieval method"""
-        # Vector similarity search
-        similar_docs = self.vectorstore.similarity_search_with_score(query, k=10)
+        # Cross-reference documents per section label, built once instead of
+        # scanning every chunk and allocating new Documents on each query
+        self.reference_docs: Dict[str, List[Document]] = {}
+        self._index_references(chunks)
+        # Per-chunk lexical data, looked up by row for each candidate: BM25 over
+        # the whole corpus (for IDF) and the query-type boost features
+        self.bm25 = None
+        self._bm25_tokens: List[List[str]] = []
+        # Rows containing each term, so keyword search only scores chunks that match
+        self._postings: Dict[str, List[int]] = {}
+        self._row_by_content: Dict[str, int] = {}
+        self._feature_rows: List[List[float]] = []
+        self.sections: List[PolicySection] = []
+        self.features = np.zeros((0, len(BOOST_QUERY_TYPES)), dtype=np.float32)
+        self._index_rows(chunks)
+
+    def _index_references(self, chunks: List[InsuranceChunk]):
+        for chunk in chunks:
+            for ref in dict.fromkeys(chunk.section_hierarchy):
+                self.reference_docs.setdefault(ref, []).append(Document(
+                    page_content=chunk.content,
+                    metadata={'source': 'cross_reference', 'reference_to': ref}
+                ))
+
+    def _index_rows(self, chunks: List[InsuranceChunk]):
+        if not chunks:
+            return
+        for chunk in chunks:
+            content_lower = chunk.content.lower()
+            self._row_by_content[chunk.content] = len(self._bm25_tokens)
+            tokens = _TOKEN_RX.findall(content_lower)
+            for term in set(tokens):
+                self._postings.setdefault(term, []).append(len(self._bm25_tokens))
+            self._bm25_tokens.append(tokens)
+            self._feature_rows.append(_boost_features(content_lower))
+            self.sections.append(PolicySection(
+                chunk.section_type or '',
+                ' > '.join(map(str, chunk.section_hierarchy)),
+                chunk.metadata.get('page'),
+                chunk.content,
+            ))
+        self.features = np.asarray(self._feature_rows, dtype=np.float32)
+        if BM25Okapi is not None:
+            self.bm25 = BM25Okapi(self._bm25_tokens)
+
+    def add_chunks(self, chunks: List[InsuranceChunk]):
+        """Register chunks that were appended to the vectorstore"""
+        for chunk in chunks:
+            self.chunk_index[len(self.chunks)] = chunk
+            self.chunks.append(chunk)
+        self._index_references(chunks)
+        self._index_rows(chunks)
+
+    def sections_for(self, docs: List[Document]) -> List[PolicySection]:
+        """Ingested sections for the given documents, in order"""
+        sections = []
+        for doc in docs:
+            row = self._row_by_content.get(doc.page_content)
+            sections.append(self.sections[row] if row is not None else PolicySection.from_document(doc))
+        return sections
+
+    def get_relevant_documents(self, query: str, embedding: Optional[List[float]] = None, k: int = 5) -> List[Document]:
+        """Main retrieval method: up to k distinct documents. A precomputed query
+        embedding skips re-encoding the query."""
+        # Vector similarity search, widened so fusion has candidates to reorder
+        fetch_k = max(k, HYBRID_CANDIDATES)
+        if embedding is not None:
+            similar_docs = self.vectorstore.similarity_search_with_score_by_vector(embedding, k=fetch_k)
+        else:
+            similar_docs = self.vectorstore.similarity_search_with_score(query, k=fetch_k)
+        
+        # Keyword search over the whole corpus, for exact terms the embedding
+        # misses (section numbers, defined terms). These carry the weakest dense
+        # score, so they rank on BM25 alone.
+        dense_floor = min((score for _, score in similar_docs), default=0.0)
+        similar_docs += [(doc, dense_floor) for doc in self._keyword_candidates(query, fetch_k)]
         
         # Extract and classify query
         insurance_keywords = self._extract_insurance_keywords(query)
@@ -464,9 +913,7 @@ class HybridInsuranceRetriever:
         expanded_docs = self._expand_with_references(similar_docs, query_type)
         
         # Re-rank results
-        final_docs = self._rerank_results(expanded_docs, query, query_type)
-        
-        return final_docs[:5]
+        return self._rerank_results(expanded_docs, query, query_type, top_n=k)
     
     def _extract_insurance_keywords(self, query: str) -> List[str]:
         """Extract insurance-specific terms from query"""
@@ -474,7 +921,8 @@ class HybridInsuranceRetriever:
             'deductible', 'premium', 'coverage', 'exclusion', 'claim', 
             'policy', 'benefit', 'liability', 'comprehensive', 'collision'
         ]
-        return [term for term in insurance_terms if term.lower() in query.lower()]
+        query_lower = query.lower()
+        return [term for term in insurance_terms if term in query_lower]
     
     def _classify_query_type(self, query: str) -> str:
         """Classify the type of insurance question"""
@@ -491,7 +939,40 @@ class HybridInsuranceRetriever:
         else:
             return 'general'
     
-    def _expand_with_references(self, docs: List[tuple], query_type: str) -> List[Document]:
+    def _query_terms(self, query: str) -> List[str]:
+        """Distinct query tokens, capped to the HYBRID_MAX_QUERY_TERMS rarest in the corpus"""
+        terms = list(dict.fromkeys(_tokenize(query)))
+        if len(terms) > HYBRID_MAX_QUERY_TERMS:
+            if self.bm25 is None:
+                return terms[:HYBRID_MAX_QUERY_TERMS]
+            idf = self.bm25.idf
+            terms = heapq.nlargest(HYBRID_MAX_QUERY_TERMS, terms, key=lambda term: idf.get(term, 0.0))
+        return terms
+
+    def _keyword_candidates(self, query: str, n: int) -> List[Document]:
+        """Top-n chunks by BM25 over the whole corpus (none without rank_bm25).
+
+        Scored from the posting lists of the query terms, so the cost follows the
+        number of matching chunks rather than the corpus size.
+        """
+        terms = self._query_terms(query)
+        bm25 = self.bm25
+        if bm25 is None or HYBRID_KEYWORD_WEIGHT <= 0 or not terms:
+            return []
+        avgdl = bm25.avgdl or 1.0
+        scores: Dict[int, float] = {}
+        for term in terms:
+            idf = bm25.idf.get(term)
+            if not idf:
+                continue
+            for row in self._postings.get(term, ()):
+                tf = bm25.doc_freqs[row][term]
+                norm = tf + bm25.k1 * (1 - bm25.b + bm25.b * bm25.doc_len[row] / avgdl)
+                scores[row] = scores.get(row, 0.0) + idf * tf * (bm25.k1 + 1) / norm
+        best = heapq.nlargest(n, scores.items(), key=lambda item: item[1])
+        return [_chunk_to_document(self.chunks[row]) for row, score in best if score > 0]
+
+    def _expand_with_references(self, docs: List[tuple], query_type: str) -> List[tuple]:
         """Expand results with cross-referenced sections"""
         expanded = []
         
@@ -503,55 +984,81 @@ class HybridInsuranceRetriever:
             if chunk_id and int(chunk_id) in self.chunk_index:
                 chunk = self.chunk_index[int(chunk_id)]
                 for ref in chunk.cross_references:
-                    ref_chunks = [c for c in self.chunks if ref in c.section_hierarchy]
-                    for ref_chunk in ref_chunks:
-                        ref_doc = Document(
-                            page_content=ref_chunk.content,
-                            metadata={'source': 'cross_reference', 'reference_to': ref}
-                        )
+                    for ref_doc in self.reference_docs.get(ref, ()):
                         expanded.append((ref_doc, score * 0.8))
         
-        return [doc for doc, score in expanded]
+        # A referenced section is often also a direct hit; keep the first copy.
+        # Keyed on a digest of the full text, so chunks that merely start alike
+        # (e.g. the same section header) are not conflated.
+        unique = {}
+        for doc, score in expanded:
+            unique.setdefault(_content_digest(doc.page_content), (doc, score))
+        return list(unique.values())
     
-    def _rerank_results(self, docs: List[Document], query: str, query_type: str) -> List[Document]:
-        """Re-rank results based on insurance-specific criteria"""
-        scored_docs = []
+    def _rerank_results(self, scored: List[tuple], query: str, query_type: str, top_n: int = 5) -> List[Document]:
+        """Re-rank (doc, dense score) pairs based on insurance-specific criteria"""
+        if not scored:
+            return []
+        docs = [doc for doc, _ in scored]
+        query_words = self._query_terms(query)
+        rows = [self._row_by_content.get(doc.page_content) for doc in docs]
         
-        for doc in docs:
-            score = 0
-            content_lower = doc.page_content.lower()
-            
-            # Base relevance scoring
-            query_words = query.lower().split()
-            matching_words = sum(1 for word in query_words if word in content_lower)
-            score += matching_words / len(query_words)
-            
-            # Boost for document type matching query type
-            if query_type == 'coverage_check' and 'coverage' in content_lower:
-                score += 0.3
-            elif query_type == 'exclusion_lookup' and 'exclusion' in content_lower:
-                score += 0.3
-            elif query_type == 'definition_lookup' and any(word in content_lower for word in ['definition', 'means']):
-                score += 0.3
-            
-            scored_docs.append((doc, score))
+        # Base relevance: weighted fusion of normalized keyword and dense scores
+        dense = _min_max(np.asarray([score for _, score in scored], dtype=np.float32))
+        lexical = _min_max(np.asarray(self._lexical_scores(docs, rows, query_words), dtype=np.float32))
+        scores = HYBRID_SEMANTIC_WEIGHT * dense + HYBRID_KEYWORD_WEIGHT * lexical
+        
+        # Boost for document type matching query type, from ingest-time features
+        if query_type in BOOST_QUERY_TYPES:
+            column = BOOST_QUERY_TYPES.index(query_type)
+            if None in rows:
+                features = np.asarray([_boost_features(doc.page_content.lower()) for doc in docs], dtype=np.float32)
+            else:
+                features = self.features[rows]
+            scores += 0.3 * features[:, column]
+        
+        scored_docs = list(zip(docs, scores.tolist()))
         
-        # Sort by score and return documents
-        scored_docs.sort(key=lambda x: x[1], reverse=True)
-        return [doc for doc, score in scored_docs]
+        # Partial selection of the top_n; same order as a stable descending sort
+        return [doc for doc, score in heapq.nlargest(top_n, scored_docs, key=lambda x: x[1])]
+
+    def _lexical_scores(self, docs: List[Document], rows: List[Optional[int]], query_words: List[str]) -> List[float]:
+        """Per-doc query match: BM25 when available, otherwise the fraction of
+        query words found in the doc."""
+        if not query_words:
+            return [0.0] * len(docs)
+        if self.bm25 is not None and None not in rows:
+            # rank_bm25 returns a plain list here (get_scores is the one returning an array)
+            return list(self.bm25.get_batch_scores(query_words, rows))
+        return [
+            sum(1 for word in query_words if word in doc.page_content.lower()) / len(query_words)
+            for doc in docs
+        ]
 
 # Maintain your original global service instance pattern
 _rag_service: Optional[RAGService] = None
+_rag_lock = threading.Lock()
 
 def get_rag_service() -> RAGService:
-    """Your original get_rag_service function"""
+    """Your original get_rag_service function.
+
+    Safe to call from the app's startup hook to build the index eagerly;
+    concurrent first callers wait on the lock instead of each building one.
+    """
     global _rag_service
     if _rag_service is None:
-        print("Initializing RAG Service...")
-        _rag_service = RAGService()
-        print("RAG Service Initialized.")
+        with _rag_lock:
+            if _rag_service is None:
+                print("Initializing RAG Service...")
+                _rag_service = RAGService()
+                print("RAG Service Initialized.")
     return _rag_service
 
+# Decision phrases, matched case-insensitively in one pass per context
+_COVERAGE_PHRASES_RX = re.compile(r'coverage applies|covered for|benefits include|policy covers', re.IGNORECASE)
+_EXCLUSION_PHRASES_RX = re.compile(r'not covered|excluded|does not cover|limitation applies', re.IGNORECASE)
+_PROCEDURE_PHRASES_RX = re.compile(r'must file|required to submit|within|deadline', re.IGNORECASE)
+
 def analyse_claim_with_rag(
     claim_type: str,
     description: Optional[str],
@@ -566,8 +1073,7 @@ def analyse_claim_with_rag(
         # Initialize with default documents directory if available
         default_docs = [os.path.join(DOCUMENTS_DIR, f) for f in os.listdir(DOCUMENTS_DIR) if f.endswith(".pdf")] if os.path.exists(DOCUMENTS_DIR) else []
         if default_docs:
-            rag_service.add_documents(default_docs)
-            rag_service.initialize_enhanced_retrieval(default_docs[0])
+            rag_service.initialize_enhanced_retrieval(new_file_paths=default_docs)
     
     # Add new claim-related files
     if files:
@@ -580,8 +1086,16 @@ def analyse_claim_with_rag(
     
     query = ". ".join(query_parts)
 
+    # Encode a few reformulations in one batched call and search with their
+    # mean (re-normalized, since the index scores by inner product)
+    query_embedding = None
+    if rag_service.hybrid_retriever:
+        variants = [query, claim_type] + ([description] if description else [])
+        vectors = _l2_normalize(np.asarray(rag_service.embed_model.embed_documents(variants), dtype=np.float32))
+        query_embedding = _l2_normalize(vectors.mean(axis=0)).tolist()
+
     # Retrieve relevant information using enhanced system
-    relevant_chunks = rag_service.retrieve(query, top_k=8)
+    relevant_chunks = rag_service.retrieve(query, top_k=8, embedding=query_embedding)
 
     # Enhanced context analysis
     context_analysis = {
@@ -656,8 +1170,7 @@ def analyse_claim_with_rag(
     
     # Analyze coverage contexts
     for context in context_analysis['coverage_contexts']:
-        text_lower = context['text'].lower()
-        if any(phrase in text_lower for phrase in ['coverage applies', 'covered for', 'benefits include', 'policy covers']):
+        if _COVERAGE_PHRASES_RX.search(context['text']):
             coverage_indicators += 1
             output["requirements_met"].append(f"Coverage indicated in policy {context['citation']}")
             output["supporting_evidence"].append({
@@ -669,8 +1182,7 @@ def analyse_claim_with_rag(
     
     # Analyze exclusion contexts
     for context in context_analysis['exclusion_contexts']:
-        text_lower = context['text'].lower()
-        if any(phrase in text_lower for phrase in ['not covered', 'excluded', 'does not cover', 'limitation applies']):
+        if _EXCLUSION_PHRASES_RX.search(context['text']):
             exclusion_indicators += 1
             output["exclusions_triggered"].append(f"Exclusion found in policy {context['citation']}")
             output["supporting_evidence"].append({
@@ -699,8 +1211,7 @@ def analyse_claim_with_rag(
     
     # Process procedural requirements
     for context in context_analysis['procedure_contexts']:
-        text_lower = context['text'].lower()
-        if any(phrase in text_lower for phrase in ['must file', 'required to submit', 'within', 'deadline']):
+        if _PROCEDURE_PHRASES_RX.search(context['text']):
             output["procedural_requirements"].append({
                 "requirement": context['text'][:200] + "...",
                 "source": context['citation']
@@ -755,21 +1266,8 @@ def analyse_claim_with_rag(
 
     return json.dumps(output, indent=2)
 
-# Enhanced RAG Chain Creation (new functionality)
-def create_enhanced_insurance_rag(api_key: str, pdf_path: str = None):
-    """Create an enhanced RAG system that integrates with your existing service"""
-    rag_service = get_rag_service()
-    
-    if pdf_path:
-        # Initialize enhanced capabilities
-        rag_service.initialize_enhanced_retrieval(pdf_path)
-    
-    if not rag_service.vectorstore:
-        print("Enhanced retrieval not available, using original RAG service")
-        return None
-    
-    # Enhanced prompt template
-    enhanced_prompt = ChatPromptTemplate.from_template("""
+# Enhanced prompt template, parsed once at import
+_ENHANCED_PROMPT = ChatPromptTemplate.from_template("""
     You are an expert insurance policy analyst. Use the provided policy context to answer the user's question.
 
     IMPORTANT INSTRUCTIONS:
@@ -787,40 +1285,71 @@ def create_enhanced_insurance_rag(api_key: str, pdf_path: str = None):
 
     Analysis:
     """)
+
+@functools.lru_cache(maxsize=4)
+def _get_chat_model(api_key: str) -> ChatOpenAI:
+    """One chat model per API key, so every chain shares its keep-alive connection pool."""
+    http_client = httpx.Client(
+        http2=_HTTP2,
+        limits=httpx.Limits(max_keepalive_connections=20),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
+    return ChatOpenAI(
+        temperature=0,
+        model='gpt-4o-mini',
+        api_key=api_key,
+        http_client=http_client,
+    )
+
+# Enhanced RAG Chain Creation (new functionality)
+def create_enhanced_insurance_rag(api_key: str, pdf_path: str = None):
+    """Create an enhanced RAG system that integrates with your existing service"""
+    rag_service = get_rag_service()
+    
+    if pdf_path:
+        # Add the PDF to the shared index; other callers keep the existing corpus
+        rag_service.add_documents([pdf_path])
+    
+    if not rag_service.vectorstore:
+        print("Enhanced retrieval not available, using original RAG service")
+        return None
     
-    # Chat model
     try:
-        chat_model = ChatOpenAI(
-            temperature=0,
-            model='gpt-4o-mini',
-            api_key=api_key
-        )
+        chat_model = _get_chat_model(api_key)
     except Exception as e:
         print(f"OpenAI model initialization failed: {e}")
         return None
     
     # Build the enhanced chain
     def format_context(docs):
-        formatted_sections = []
-        for i, doc in enumerate(docs):
-            section_info = ""
-            if doc.metadata.get('section_type'):
-                section_info += f"[{doc.metadata['section_type'].upper()}] "
-            if doc.metadata.get('hierarchy'):
-                section_info += f"Section {doc.metadata['hierarchy']}: "
-            
-            formatted_sections.append(f"{section_info}\n{doc.page_content}\n")
-        
-        return "\n---\n".join(formatted_sections)
+        sections = rag_service.hybrid_retriever.sections_for(docs)
+        return "\n---\n".join(section.render() for section in sections)
+    
+    def cached_retrieve(query: str) -> List[Document]:
+        # Exact hit -> similar-query hit -> real hybrid search
+        docs = rag_service.query_cache.get(query)
+        if docs is None:
+            embedding = rag_service.embed_query(query)
+            docs = rag_service.query_cache.get_similar(embedding)
+            if docs is None:
+                docs = rag_service.hybrid_retriever.get_relevant_documents(query, embedding=list(embedding))
+                rag_service.query_cache.put(query, embedding, docs)
+        return docs
     
     enhanced_chain = (
-        {"context": rag_service.hybrid_retriever.get_relevant_documents | format_context, "question": lambda x: x}
-        | enhanced_prompt
+        {"context": RunnableLambda(cached_retrieve) | format_context, "question": lambda x: x}
+        | _ENHANCED_PROMPT
         | chat_model
     )
     
     return enhanced_chain, rag_service.hybrid_retriever
 
+def cache_stats() -> Dict[str, int]:
+    """Hit/miss/eviction counters of the enhanced chain's retrieval cache."""
+    if _rag_service is None:
+        return {}
+    return _rag_service.query_cache.stats()
+
 # Utility functions for source inspection
 def query_with_sources(rag_chain, query: str, hybrid_retriever):
     """Query the RAG system and show both answer and sources"""
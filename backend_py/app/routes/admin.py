@@ -1,8 +1,15 @@
+import base64
+import itertools
+import json
+import os
+import time
+from datetime import date, datetime
 from fastapi import APIRouter, Depends, HTTPException, Query, Body
-from pydantic import BaseModel
-from sqlalchemy import text
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict, TypeAdapter, field_serializer
+from sqlalchemy import func, or_, tuple_
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 from ..db import get_db
 from ..models import Claim, ChatMessage, UserRole, User, ClaimProgress, ClaimDocument
 from ..services.ai import summarize_claim_for_staff
@@ -11,40 +18,123 @@ from ..auth_utils import require_active_user_with_roles
 class StatusUpdate(BaseModel):
     status: str
 
-router = APIRouter()
+class ClaimOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    claim_number: Optional[str] = None
+    claim_type: Optional[str] = None
+    status: Optional[str] = None
+    incident_date: Optional[Union[datetime, date]] = None
+    estimated_completion: Optional[Union[datetime, date]] = None
+
+    # Same strings the dashboard got from isoformat() before (no "Z" rewriting)
+    @field_serializer("incident_date", "estimated_completion")
+    def _iso(self, value: Optional[Union[datetime, date]]) -> Optional[str]:
+        return value.isoformat() if value else None
+
+_claim_list = TypeAdapter(List[ClaimOut])
+
+# created_at is only needed for the pagination cursor
+_CLAIM_LIST_COLUMNS = (
+    Claim.id, Claim.claim_number, Claim.claim_type, Claim.status,
+    Claim.incident_date, Claim.estimated_completion, Claim.created_at,
+)
+CLAIM_LIST_BATCH_SIZE = 500
+
+def _dump_claims(rows) -> List[Dict[str, Any]]:
+    """One validate + dump call over the rows, done in pydantic-core."""
+    return _claim_list.dump_python(_claim_list.validate_python(rows, from_attributes=True), mode="json")
+
+# Dashboard responses are lists of claims/messages; orjson serializes them
+# several times faster than the stdlib encoder. Routes returning plain dicts
+# still go through jsonable_encoder first; the list routes below build
+# JSON-ready payloads and return ORJSONResponse themselves to skip it.
+router = APIRouter(default_response_class=ORJSONResponse)
+
+# Built once so every route shares the same dependency callable, which FastAPI
+# then resolves at most once per request
+require_agent_or_admin = require_active_user_with_roles({UserRole.agent, UserRole.admin})
+
+# Status counts change slowly relative to dashboard refreshes; claims created or
+# moved outside this router are reflected within the TTL
+CLAIMS_SUMMARY_TTL = float(os.getenv("CLAIMS_SUMMARY_TTL", "30"))
+_claims_summary_cache: Dict[str, Any] = {"summary": None, "expires_at": 0.0}
+
+def _json_list(value) -> list:
+    """Decode a JSON list column; values already decoded by a JSON/JSONB column pass through."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+def _encode_cursor(claim) -> str:
+    # An empty timestamp marks a cursor inside the leading NULL created_at rows
+    created_at = claim.created_at.isoformat() if claim.created_at else ""
+    return base64.urlsafe_b64encode(f"{created_at}|{claim.id}".encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, claim_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return (datetime.fromisoformat(created_at) if created_at else None), int(claim_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.get("/claims")
-async def list_admin_claims(
+def list_admin_claims(
     status: Optional[List[str]] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = Query(None),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_active_user_with_roles({UserRole.agent, UserRole.admin})),
+    current_user: User = Depends(require_agent_or_admin),
 ):
-    query = db.query(Claim)
+    # Just the listed columns: plain rows, no ORM objects in the identity map
+    query = db.query(*_CLAIM_LIST_COLUMNS)
     if status:
         query = query.filter(Claim.status.in_(status))
     
-    claims = query.order_by(Claim.created_at.desc()).all()
+    # Keyset pagination on (created_at, id): each page costs the same however
+    # deep it is. Without `limit` the full list is returned as before.
+    # Claims without a created_at come first, as with the original plain
+    # DESC ordering on Postgres, and are ordered by id alone.
+    query = query.order_by(Claim.created_at.desc().nulls_first(), Claim.id.desc())
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        if cursor_created_at is None:
+            # Rest of the NULL rows, then every dated claim
+            query = query.filter(or_(Claim.created_at.isnot(None), Claim.id < cursor_id))
+        else:
+            query = query.filter(tuple_(Claim.created_at, Claim.id) < (cursor_created_at, cursor_id))
     
-    return {"claims": [
-        {
-            "id": c.id,
-            "claim_number": c.claim_number,
-            "claim_type": c.claim_type,
-            "status": c.status,
-            "incident_date": c.incident_date.isoformat() if c.incident_date else None,
-            "estimated_completion": c.estimated_completion.isoformat() if c.estimated_completion else None,
-        }
-        for c in claims
-    ]}
+    next_cursor = None
+    if limit is None:
+        # Full list: stream rows from the cursor and serialize them in batches
+        # rather than holding every fetched row at once
+        # One iterator: every iter() of a Query re-runs the SQL from the top
+        rows = iter(query.yield_per(CLAIM_LIST_BATCH_SIZE))
+        claims = []
+        while batch := list(itertools.islice(rows, CLAIM_LIST_BATCH_SIZE)):
+            claims.extend(_dump_claims(batch))
+    else:
+        rows = query.limit(limit + 1).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1])
+        claims = _dump_claims(rows)
+    
+    # Already JSON-ready: hand it to orjson directly, skipping jsonable_encoder
+    return ORJSONResponse({"next_cursor": next_cursor, "claims": claims})
 
-@router.get("/claims-summary", dependencies=[Depends(require_active_user_with_roles({UserRole.agent, UserRole.admin}))])
-async def get_claims_summary(db: Session = Depends(get_db)):
+@router.get("/claims-summary", dependencies=[Depends(require_agent_or_admin)])
+def get_claims_summary(db: Session = Depends(get_db)):
     """Provides a summary of claim counts by status."""
-    from sqlalchemy import func
-
-    summary_query = db.query(Claim.status, func.count(Claim.id)).group_by(Claim.status).all()
-    
-    summary = {status: count for status, count in summary_query}
+    # Dashboards poll this; serve the GROUP BY result from memory for a short TTL
+    summary = _claims_summary_cache["summary"]
+    if summary is None or time.monotonic() >= _claims_summary_cache["expires_at"]:
+        summary_query = db.query(Claim.status, func.count(Claim.id)).group_by(Claim.status).all()
+        summary = {status: count for status, count in summary_query}
+        _claims_summary_cache.update(summary=summary, expires_at=time.monotonic() + CLAIMS_SUMMARY_TTL)
 
     return {
         "message": "Successfully retrieved claim summary.",
@@ -67,8 +157,8 @@ async def get_claim_summary(claim_id: int, db: Session = Depends(get_db)):
     summary = await summarize_claim_for_staff(claim, messages)
     return summary
 
-@router.get("/claims/{claim_id}", dependencies=[Depends(require_active_user_with_roles({UserRole.agent, UserRole.admin}))])
-async def get_admin_claim(claim_id: int, db: Session = Depends(get_db)):
+@router.get("/claims/{claim_id}", dependencies=[Depends(require_agent_or_admin)])
+def get_admin_claim(claim_id: int, db: Session = Depends(get_db)):
     claim = db.query(Claim).filter(Claim.id == claim_id).first()
     if not claim:
         raise HTTPException(status_code=404, detail="Claim not found")
@@ -84,8 +174,8 @@ async def get_admin_claim(claim_id: int, db: Session = Depends(get_db)):
         }
     }
 
-@router.get("/claims/{claim_id}/progress", dependencies=[Depends(require_active_user_with_roles({UserRole.agent, UserRole.admin}))])
-async def get_admin_claim_progress(claim_id: int, db: Session = Depends(get_db)):
+@router.get("/claims/{claim_id}/progress", dependencies=[Depends(require_agent_or_admin)])
+def get_admin_claim_progress(claim_id: int, db: Session = Depends(get_db)):
     claim = db.query(Claim).filter(Claim.id == claim_id).first()
     if not claim:
         raise HTTPException(status_code=404, detail="Claim not found")
@@ -102,40 +192,35 @@ async def get_admin_claim_progress(claim_id: int, db: Session = Depends(get_db))
             "completed_at": step.completed_at.isoformat() if step.completed_at else None,
             "description": step.description,
         })
-    return {"progress": progress_list}
+    return ORJSONResponse({"progress": progress_list})
 
-@router.get("/chat/{claim_id}/history", dependencies=[Depends(require_active_user_with_roles({UserRole.agent, UserRole.admin}))])
-async def get_admin_chat_history(claim_id: int, db: Session = Depends(get_db)):
+@router.get("/chat/{claim_id}/history", dependencies=[Depends(require_agent_or_admin)])
+def get_admin_chat_history(claim_id: int, db: Session = Depends(get_db)):
     claim = db.query(Claim).filter(Claim.id == claim_id).first()
     if not claim:
         raise HTTPException(status_code=404, detail="Claim not found")
 
-    rows = db.execute(
-        text(
-            """
-            SELECT id, role, message, created_at
-            FROM chat_messages
-            WHERE claim_id = :cid
-            ORDER BY id
-            """
-        ),
-        {"cid": claim_id},
-    ).mappings().all()
+    rows = (
+        db.query(ChatMessage.id, ChatMessage.role, ChatMessage.message, ChatMessage.created_at)
+        .filter(ChatMessage.claim_id == claim_id)
+        .order_by(ChatMessage.id)
+        .all()
+    )
 
     history = []
     for row in rows:
         history.append(
             {
-                "id": row["id"],
-                "message_type": row["role"],
-                "message_text": row["message"],
-                "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+                "id": row.id,
+                "message_type": row.role,
+                "message_text": row.message,
+                "created_at": row.created_at.isoformat() if row.created_at else None,
             }
         )
-    return {"history": history}
+    return ORJSONResponse({"history": history})
 
-@router.get("/claims/{claim_id}/documents", dependencies=[Depends(require_active_user_with_roles({UserRole.agent, UserRole.admin}))])
-async def get_admin_claim_documents(claim_id: int, db: Session = Depends(get_db)):
+@router.get("/claims/{claim_id}/documents", dependencies=[Depends(require_agent_or_admin)])
+def get_admin_claim_documents(claim_id: int, db: Session = Depends(get_db)):
     claim = db.query(Claim).filter(Claim.id == claim_id).first()
     if not claim:
         raise HTTPException(status_code=404, detail="Claim not found")
@@ -153,19 +238,20 @@ async def get_admin_claim_documents(claim_id: int, db: Session = Depends(get_db)
                 "status": doc.status,
                 "validation_status": doc.validation_status,
                 "validation_confidence": doc.validation_confidence,
-                "validation_issues": json.loads(doc.validation_issues) if doc.validation_issues else [],
-                "validation_suggestions": json.loads(doc.validation_suggestions) if doc.validation_suggestions else []
+                "validation_issues": _json_list(doc.validation_issues),
+                "validation_suggestions": _json_list(doc.validation_suggestions)
             }
             for doc in documents
         ]
     }
 
-@router.put("/claims/{claim_id}/status", dependencies=[Depends(require_active_user_with_roles({UserRole.agent, UserRole.admin}))])
-async def update_claim_status(claim_id: int, status_update: StatusUpdate, db: Session = Depends(get_db)):
+@router.put("/claims/{claim_id}/status", dependencies=[Depends(require_agent_or_admin)])
+def update_claim_status(claim_id: int, status_update: StatusUpdate, db: Session = Depends(get_db)):
     claim = db.query(Claim).filter(Claim.id == claim_id).first()
     if not claim:
         raise HTTPException(status_code=404, detail="Claim not found")
 
     claim.status = status_update.status
     db.commit()
+    _claims_summary_cache["summary"] = None  # counts by status just changed
     return {"status": claim.status}
\ No newline at end of file
@@ -4,20 +4,19 @@ from __future__ import annotations
 print("=== LOADING Enhanced Chat MODULE ===")
 from typing import List, Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, Header, Form, UploadFile, File
-from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 from datetime import datetime, timezone
 
+import asyncio
 import os
-import json
+import threading
 from ..db import get_db
 from ..models import ChatMessage, Claim, ClaimProgress, ClaimDocument
-from ..auth_utils import decode_access_token
+from .helpers import get_user_id, save_upload
 from ..sockets import sio
 from ..services.ai import generate_ai_reply_rag, AIAnswer, _client as openai_client
-from ..rag import RAGService, get_rag_service, analyse_claim_with_rag
-from ..services.ai_validation import get_smart_validation_status, get_basic_checklist_items
+from ..rag import get_rag_service
+from ..services.ai_validation import get_smart_validation_status
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -170,15 +169,19 @@ Expected processing time is 3-5 business days."""
     )
 
 
-def _get_user_id(authorization: str | None) -> int:
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing token")
-    token = authorization.split(" ", 1)[1]
-    payload = decode_access_token(token)
-    try:
-        return int(payload.get("sub"))
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token payload")
+# Serializes index updates and searches on the shared RAG service across worker threads
+_rag_lock = threading.Lock()
+
+def _rag_context(uploaded_documents: list[str], saved_files: list[str], query: str) -> List[Any]:
+    """Index the claim's documents and retrieve context for the query (blocking)."""
+    rag_service = get_rag_service()
+    with _rag_lock:
+        # Add existing uploaded documents
+        if uploaded_documents:
+            rag_service.add_documents(uploaded_documents)
+        if saved_files:
+            rag_service.add_documents(saved_files)
+        return rag_service.retrieve(query, top_k=5)
 
 
 @router.get("/{claim_id}/validation-status")
@@ -188,7 +191,7 @@ async def get_validation_status(
     authorization: str | None = Header(default=None),
 ):
     """Get current validation status with progress and next steps"""
-    user_id = _get_user_id(authorization)
+    user_id = get_user_id(authorization)
     claim = db.query(Claim).filter(Claim.id == claim_id, Claim.user_id == user_id).first()
     if not claim:
         raise HTTPException(status_code=404, detail="Claim not found")
@@ -212,31 +215,26 @@ def chat_history(
     db: Session = Depends(get_db),
     authorization: str | None = Header(default=None),
 ):
-    user_id = _get_user_id(authorization)
+    user_id = get_user_id(authorization)
     claim = db.query(Claim).filter(Claim.id == claim_id, Claim.user_id == user_id).first()
     if not claim:
         raise HTTPException(status_code=404, detail="Claim not found")
 
-    rows = db.execute(
-        text(
-            """
-            SELECT id, role, message, created_at
-            FROM chat_messages
-            WHERE claim_id = :cid
-            ORDER BY id
-            """
-        ),
-        {"cid": claim_id},
-    ).mappings().all()
+    rows = (
+        db.query(ChatMessage.id, ChatMessage.role, ChatMessage.message, ChatMessage.created_at)
+        .filter(ChatMessage.claim_id == claim_id)
+        .order_by(ChatMessage.id)
+        .all()
+    )
 
     history = []
     for row in rows:
         history.append(
             {
-                "id": row["id"],
-                "message_type": row["role"],
-                "message_text": row["message"],
-                "created_at": row["created_at"].isoformat() if row["created_at"] else None,
+                "id": row.id,
+                "message_type": row.role,
+                "message_text": row.message,
+                "created_at": row.created_at.isoformat() if row.created_at else None,
             }
         )
     return {"history": history}
@@ -255,7 +253,7 @@ async def send_message(
     print(f"DEBUG CHAT: Message: '{message_text}'")
     print(f"DEBUG CHAT: Has file: {file is not None}")
 
-    user_id = _get_user_id(authorization)
+    user_id = get_user_id(authorization)
     claim = db.query(Claim).filter(Claim.id == claim_id, Claim.user_id == user_id).first()
     if not claim:
         raise HTTPException(status_code=404, detail="Claim not found")
@@ -292,8 +290,7 @@ async def send_message(
         # Use absolute path in container
         storage_path = f"/home/app/uploads/claims/{claim_id}/{file.filename}"
         os.makedirs(os.path.dirname(storage_path), exist_ok=True)
-        with open(storage_path, "wb") as f:
-            f.write(await file.read())
+        await save_upload(file, storage_path)
         attachment_url = f"/static/uploads/claims/{claim_id}/{file.filename}"
         attachment_name = file.filename
         saved_files.append(storage_path)
@@ -308,9 +305,8 @@ async def send_message(
             document_type=doc_type,
             status="pending_validation",
         )
+        # Committed together with the user's message below
         db.add(doc_record)
-        db.commit()
-        db.refresh(doc_record)
 
     # Store user's message
     user_chat = ChatMessage(
@@ -327,7 +323,9 @@ async def send_message(
     print(f"DEBUG CHAT: Stored user message with ID: {user_chat.id}")
 
     room = str(claim_id)
-    await sio.emit(
+    # Broadcast while the validation status is computed; awaited before anything
+    # else goes to the room so clients still see the messages in order
+    user_emit = asyncio.create_task(sio.emit(
         "chat_message",
         {
             "id": user_chat.id,
@@ -338,12 +336,16 @@ async def send_message(
             "attachment": {"name": attachment_name, "url": attachment_url} if attachment_url else None,
         },
         to=room,
-    )
-    print("DEBUG CHAT: Emitted user message via socket")
+    ))
 
     # Get current validation status AFTER potential upload
-    claim_documents = db.query(ClaimDocument).filter(ClaimDocument.claim_id == claim_id).all()
-    validation_status = await get_smart_validation_status(claim, claim_documents, openai_client)
+    try:
+        claim_documents = db.query(ClaimDocument).filter(ClaimDocument.claim_id == claim_id).all()
+        validation_status = await get_smart_validation_status(claim, claim_documents, openai_client)
+    finally:
+        # Awaited on every path, so a failed validation never leaves the task dangling
+        await user_emit
+    print("DEBUG CHAT: Emitted user message via socket")
 
     print(f"DEBUG VALIDATION: Current validation status: {validation_status.get('decision_hint')}")
     print(f"DEBUG VALIDATION: Progress: {validation_status.get('progress')}%")
@@ -359,9 +361,8 @@ async def send_message(
         setattr(claim, "validation_progress", validation_status.get("progress", 100))
         # A simple textual status string if your Claim model stores it
         setattr(claim, "validation_status", validation_status.get("decision_hint", "ready_for_review"))
-        db.commit()
 
-        # Create/append a progress step
+        # Create/append a progress step (one commit with the status change)
         progress_step = ClaimProgress(
             claim_id=claim_id,
             step_id="human_review_started",
@@ -460,14 +461,6 @@ async def send_message(
     print(f"DEBUG RAG: Message length: {len(message_text)}")
 
     try:
-        rag_service = get_rag_service()
-
-        # Add existing uploaded documents
-        if getattr(claim, "uploaded_documents", None):
-            rag_service.add_documents(claim.uploaded_documents)
-        if saved_files:
-            rag_service.add_documents(saved_files)
-
         # Enhanced query that includes validation context
         query_parts = [message_text]
         if file:
@@ -479,7 +472,13 @@ async def send_message(
         print(f"DEBUG RAG: Enhanced query: '{enhanced_query}'")
 
         try:
-            context_chunks: List[Any] = rag_service.retrieve(enhanced_query, top_k=5)
+            # Indexing and search block on CPU; keep them off the event loop
+            context_chunks: List[Any] = await asyncio.to_thread(
+                _rag_context,
+                getattr(claim, "uploaded_documents", None) or [],
+                saved_files,
+                enhanced_query,
+            )
             print(f"DEBUG RAG: Retrieved {len(context_chunks)} chunks")
         except Exception as e:
             print(f"DEBUG RAG: RAG service error: {e}")
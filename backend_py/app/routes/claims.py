@@ -1,6 +1,5 @@
 from fastapi import APIRouter, Depends, Header, HTTPException, File, UploadFile, Form
 from pathlib import Path
-import uuid
 import random
 import string
 from datetime import datetime, date, timezone
@@ -8,9 +7,8 @@ from typing import List, Optional
 from sqlalchemy.orm import Session
 from ..db import get_db
 from ..models import Claim, ClaimProgress, ClaimDocument, User
-from ..auth_utils import decode_access_token
-from ..rag import analyse_claim_with_rag
 from .chat import initiate_smart_document_request, send_human_review_message
+from .helpers import get_user_id, save_upload
 from ..services.ai_validation import get_smart_validation_status, AIDocumentValidator 
 from ..services.ai import _client as openai_client
 from ..sockets import sio
@@ -19,16 +17,6 @@ import json
 
 router = APIRouter(prefix="/claims", tags=["claims"])
 
-def _get_user_id(authorization: str | None) -> int:
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing token")
-    token = authorization.split(" ", 1)[1]
-    payload = decode_access_token(token)
-    try:
-        return int(payload.get("sub"))
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token payload")
-
 @router.post("")
 async def create_claim(
     claim_type: str = Form(...),
@@ -40,7 +28,7 @@ async def create_claim(
     authorization: str | None = Header(default=None),
 ):
     """Create a new claim with enhanced validation and AI analysis."""
-    user_id = _get_user_id(authorization)
+    user_id = get_user_id(authorization)
     
     # Generate claim number
     rand_part = ''.join(random.choices(string.digits, k=6))
@@ -74,9 +62,7 @@ async def create_claim(
     for file in files:
         # Save file with consistent naming
         file_path = upload_dir / file.filename
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        file_size = await save_upload(file, file_path)
         
         # Create database record
         doc_record = ClaimDocument(
@@ -85,7 +71,7 @@ async def create_claim(
             file_url=f"/static/uploads/claims/{claim.id}/{file.filename}",
             document_type="initial_upload",
             status="pending_validation",
-            file_size_bytes=len(content),
+            file_size_bytes=file_size,
             mime_type=file.content_type
         )
         db.add(doc_record)
@@ -177,7 +163,7 @@ async def upload_documents(
     authorization: str | None = Header(default=None),
 ):
     """Enhanced document upload with real-time validation."""
-    user_id = _get_user_id(authorization)
+    user_id = get_user_id(authorization)
     claim = db.query(Claim).filter(Claim.id == claim_id, Claim.user_id == user_id).first()
     if not claim:
         raise HTTPException(status_code=404, detail="Claim not found")
@@ -191,9 +177,7 @@ async def upload_documents(
     
     for file in files:
         file_path = upload_dir / file.filename
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        file_size = await save_upload(file, file_path)
         
         # Create document record
         doc_record = ClaimDocument(
@@ -202,7 +186,7 @@ async def upload_documents(
             file_url=f"/static/uploads/claims/{claim_id}/{file.filename}",
             document_type="supplemental_upload",
             status="pending_validation",
-            file_size_bytes=len(content),
+            file_size_bytes=file_size,
             mime_type=file.content_type
         )
         db.add(doc_record)
@@ -352,7 +336,7 @@ async def get_claim_validation_status(
     authorization: str | None = Header(default=None)
 ):
     """Get detailed validation status for a claim."""
-    user_id = _get_user_id(authorization)
+    user_id = get_user_id(authorization)
     claim = db.query(Claim).filter(Claim.id == claim_id, Claim.user_id == user_id).first()
     if not claim:
         raise HTTPException(status_code=404, detail="Claim not found")
@@ -379,7 +363,7 @@ async def get_claim_validation_status(
 # Keep existing endpoints but enhance them with validation data
 @router.get("")
 def list_claims(db: Session = Depends(get_db), authorization: str | None = Header(default=None)):
-    user_id = _get_user_id(authorization)
+    user_id = get_user_id(authorization)
     claims = db.query(Claim).filter(Claim.user_id == user_id).order_by(Claim.created_at.desc()).all()
     return {"claims": [
         {
@@ -397,7 +381,7 @@ def list_claims(db: Session = Depends(get_db), authorization: str | None = Heade
 
 @router.get("/{claim_id}")
 def get_claim(claim_id: int, db: Session = Depends(get_db), authorization: str | None = Header(default=None)):
-    user_id = _get_user_id(authorization)
+    user_id = get_user_id(authorization)
     claim = db.query(Claim).filter(Claim.id == claim_id, Claim.user_id == user_id).first()
     if not claim:
         raise HTTPException(status_code=404, detail="Claim not found")
@@ -417,7 +401,7 @@ def get_claim(claim_id: int, db: Session = Depends(get_db), authorization: str |
 @router.get("/{claim_id}/progress")
 def get_claim_progress(claim_id: int, db: Session = Depends(get_db), authorization: str | None = Header(default=None)):
     """Return the progress timeline for a claim."""
-    user_id = _get_user_id(authorization)
+    user_id = get_user_id(authorization)
     claim = db.query(Claim).filter(Claim.id == claim_id, Claim.user_id == user_id).first()
     if not claim:
         raise HTTPException(status_code=404, detail="Claim not found")
@@ -0,0 +1,69 @@
+"""Request helpers shared by the chat and claims routers."""
+
+from __future__ import annotations
+from typing import Any, Dict
+from collections import OrderedDict
+from fastapi import HTTPException, UploadFile
+
+import hashlib
+import os
+import threading
+import time
+from ..auth_utils import decode_access_token
+
+
+# Decoded JWT payloads keyed by token digest, so a client's repeat requests skip
+# signature verification. Entries never outlive the token's own exp.
+JWT_CACHE_TTL = float(os.getenv("JWT_CACHE_TTL", "30"))
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+_jwt_cache: OrderedDict[str, tuple[float, Dict[str, Any]]] = OrderedDict()
+# Sync handlers run in the threadpool, so every cache access holds this
+_jwt_cache_lock = threading.Lock()
+
+def decode_token_cached(token: str) -> Dict[str, Any]:
+    """decode_access_token behind a TTL LRU cache."""
+    key = hashlib.sha256(token.encode()).hexdigest()[:32]
+    now = time.time()
+    with _jwt_cache_lock:
+        entry = _jwt_cache.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                _jwt_cache.move_to_end(key)
+                return entry[1]
+            del _jwt_cache[key]
+    # Raises on an invalid token, so failed validations are never cached
+    payload = decode_access_token(token)
+    try:
+        expires_at = min(now + JWT_CACHE_TTL, float(payload["exp"]))
+    except (KeyError, TypeError, ValueError):
+        return payload
+    with _jwt_cache_lock:
+        _jwt_cache[key] = (expires_at, payload)
+        _jwt_cache.move_to_end(key)
+        while len(_jwt_cache) > JWT_CACHE_SIZE:
+            _jwt_cache.popitem(last=False)
+    return payload
+
+
+def get_user_id(authorization: str | None) -> int:
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing token")
+    token = authorization[7:]
+    payload = decode_token_cached(token)
+    try:
+        return int(payload.get("sub"))
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid token payload")
+
+
+# Uploads are copied to disk this many bytes at a time
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+async def save_upload(file: UploadFile, path: str | os.PathLike) -> int:
+    """Stream an upload to disk without holding the whole file in memory; returns its size."""
+    size = 0
+    with open(path, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            f.write(chunk)
+            size += len(chunk)
+    return size
@@ -1,6 +1,7 @@
 from __future__ import annotations
 import os
 import json
+import asyncio
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Any, List, Dict, Optional, Union
@@ -8,6 +9,8 @@ from openai import AsyncOpenAI, OpenAI, RateLimitError
 
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Upper bound on concurrent summary requests when summarizing many claims
+OPENAI_SUMMARY_CONCURRENCY = int(os.getenv("OPENAI_SUMMARY_CONCURRENCY", "8"))
 
 print(f"DEBUG INIT: OPENAI_API_KEY exists: {OPENAI_API_KEY is not None}")
 print(f"DEBUG INIT: OPENAI_MODEL: {OPENAI_MODEL}")
@@ -417,4 +420,22 @@ Analyze for:
             "facts": [{"name": "error", "value": str(e)}],
             "recommendations": ["Manual review recommended due to AI processing error"],
             "validation_insights": ["Unable to generate automated insights"]
-        }
\ No newline at end of file
+        }
+
+async def summarize_claims_for_staff(
+    claims: List[Any],
+    messages_by_claim: Dict[Any, List[Any]],
+    max_concurrency: int = OPENAI_SUMMARY_CONCURRENCY,
+) -> List[Dict]:
+    """Summarize several claims concurrently, in the order given.
+
+    `messages_by_claim` maps claim id -> that claim's messages; load them with a
+    single `ChatMessage.claim_id.in_(...)` query rather than one per claim.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def summarize_one(claim):
+        async with semaphore:
+            return await summarize_claim_for_staff(claim, messages_by_claim.get(claim.id, []))
+
+    return await asyncio.gather(*(summarize_one(claim) for claim in claims))
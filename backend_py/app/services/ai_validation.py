@@ -7,7 +7,7 @@ from dataclasses import dataclass
 from datetime import datetime
 import re
 from pathlib import Path
-import PyPDF2
+import fitz
 from PIL import Image
 import pytesseract
 from datetime import date
@@ -314,14 +314,10 @@ class AIDocumentValidator:
         
         try:
             if file_ext == '.pdf':
-                # Extract text from PDF
-                with open(file_path, 'rb') as file:
-                    reader = PyPDF2.PdfReader(file)
-                    text = ""
-                    for page in reader.pages:
-                        text += page.extract_text() or ""
-                    data['text'] = text
-                    data['page_count'] = len(reader.pages)
+                # Extract text from PDF (PyMuPDF, same parser the RAG ingest uses)
+                with fitz.open(file_path) as pdf:
+                    data['text'] = "".join(page.get_text("text") for page in pdf)
+                    data['page_count'] = pdf.page_count
             
             elif file_ext in ['.jpg', '.jpeg', '.png', '.heic', '.webp']:
                 # OCR on images